@@ -27,16 +27,56 @@ class QuizItem(BaseModel):
 class Quiz(BaseModel):
     questions: List[QuizItem]
 
-def create_analysis_team(api_key: str, base_url: str = DEFAULT_BASE_URL, model_id: str = DEFAULT_MODEL_ID):
-    """Create a team of analysis agents"""
-
-    # Create model
-    model = OpenAILike(
+def create_model(api_key: str, base_url: str = DEFAULT_BASE_URL, model_id: str = DEFAULT_MODEL_ID):
+    """Create the OpenAI-compatible model shared by all agents"""
+    return OpenAILike(
         id=model_id,
         api_key=api_key,
         base_url=base_url
     )
 
+
+def create_quiz_agent(model):
+    """Create a standalone Quiz Maker (also used as a team member)"""
+    return Agent(
+        name="Quiz Maker",
+        role="Creates multiple-choice questions to reinforce learning",
+        model=model,
+        tools=common_tools,
+        response_model=Quiz,
+        use_json_mode=True,  # emits {"questions":[{...}, ...]}
+        expected_output="\"questions\": [",  # quick structural check
+        instructions=[
+            "Write the number of items requested (5-10 if no number is given), covering key facts of the text.",
+            "Each item has fields: question (str), options (list of 4), correct_index (int 0-3).",
+            "Never repeat a question or ask the same fact twice.",
+            "Return ONLY the JSON object matching the schema—no markdown, no prose, no back-ticks."
+        ],
+    )
+
+
+def create_notes_agent(model):
+    """Create the per-source note taker used for map-stage (prefetch) work"""
+    return Agent(
+        name="Note Taker",
+        role="Condenses a single source into dense notes for a later cross-source analysis",
+        model=model,
+        response_model=Result,
+        use_json_mode=True,
+        instructions=[
+            "You only see ONE source; another agent will combine your notes with other sources' notes.",
+            "Keep every fact, figure, name and claim needed for the requested analysis; drop filler.",
+            "Write compact markdown. Do NOT add introductory or closing notes.",
+        ],
+    )
+
+
+def create_analysis_team(api_key: str, base_url: str = DEFAULT_BASE_URL, model_id: str = DEFAULT_MODEL_ID):
+    """Create a team of analysis agents"""
+
+    # Create model
+    model = create_model(api_key, base_url, model_id)
+
     # Create specialized agents
     summarizer = Agent(
         name="Summarizer",
@@ -117,20 +157,7 @@ def create_analysis_team(api_key: str, base_url: str = DEFAULT_BASE_URL, model_i
         ],
     )
 
-    quiz_agent = Agent(
-        name="Quiz Maker",
-        role="Creates multiple-choice questions to reinforce learning",
-        model=model,
-        tools=common_tools,
-        response_model=Quiz,
-        use_json_mode=True,  # emits {"questions":[{...}, ...]}
-        expected_output="\"questions\": [",  # quick structural check
-        instructions=[
-            "Write 5-10 items covering key facts across all sources.",
-            "Each item has fields: question (str), options (list of 4), correct_index (int 0-3).",
-            "Return ONLY the JSON object matching the schema—no markdown, no prose, no back-ticks."
-        ],
-    )
+    quiz_agent = create_quiz_agent(model)
 
     # Create team
     team = Team(
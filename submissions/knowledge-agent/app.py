@@ -2,7 +2,10 @@
 def main():
     from ui.sidebar import render_sidebar
     from ui.sources import init_source_state, render_source_input, render_sources_list
-    from ui.analysis import render_analysis_config, render_analysis_button, render_results
+    from ui.analysis import (init_analysis_state, render_analysis_config, render_analysis_button,
+                             render_results, current_results)
+    from ui.session import render_session_controls
+    from ui.prefetch import render_prefetch_controls
     from ui.footer import render_footer
 
     import streamlit as st
@@ -17,6 +20,7 @@ def main():
 
     # Initialize session state
     init_source_state()
+    init_analysis_state()
 
     # Header
     st.markdown("<h1 style='text-align: center; color: #333;'>✨ KnowledgeAgent Pro ✨</h1>", unsafe_allow_html=True)
@@ -25,18 +29,21 @@ def main():
 
     # Sidebar
     api_key, base_url, model_id = render_sidebar()
+    render_prefetch_controls(api_key, base_url, model_id)
+    render_session_controls()
 
     # Main Application
     render_source_input()
     render_sources_list()
 
     # Analysis Configuration
-    selected_analysis_keys, output_length = render_analysis_config()
+    selected_analysis_keys, output_length, quiz_items = render_analysis_config()
 
     # Process Analysis
-    results = render_analysis_button(api_key, base_url, model_id, selected_analysis_keys, output_length)
+    results = render_analysis_button(api_key, base_url, model_id, selected_analysis_keys, output_length, quiz_items)
 
-    # Display Results
+    # Display Results (kept across reruns and restored snapshots)
+    results = results or current_results()
     if results:
         render_results(results)
 
@@ -0,0 +1,37 @@
+from utils import analysis_cache_key, content_hash, count_tokens, source_hash
+
+SOURCE_SEPARATOR = "\n\n--- Source Separator ---\n\n"
+
+
+class Corpus:
+    """
+    Read-only view over the session's sources that never concatenates them.
+
+    Each source text is referenced, not copied; the "Source N:" headers and
+    separators are small strings kept alongside. Token counts and hashes are
+    taken per source, and a prompt is built with a single join right before
+    it is sent.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self._segments = []
+        for i, s in enumerate(self.sources):
+            self._segments.append(f"{SOURCE_SEPARATOR if i else ''}Source {i + 1}:\n")
+            self._segments.append(s["content"])
+
+    def render(self, prefix="", suffix=""):
+        """Materialise ``prefix + combined text + suffix`` with one allocation"""
+        return "".join([prefix, *self._segments, suffix])
+
+    def token_count(self):
+        """Total tokens, from per-source counts taken at ingestion time"""
+        return sum(s["tokens"] if "tokens" in s else count_tokens(s["content"]) for s in self.sources)
+
+    def key(self):
+        """Hash of the ordered sources, built from per-source hashes"""
+        return content_hash("\x00".join(source_hash(s) for s in self.sources))
+
+    def cache_key(self, analysis_type, output_length, model_id, base_url, options=None):
+        """Cache key of one lens run over this corpus"""
+        return analysis_cache_key(self.sources, analysis_type, output_length, model_id, base_url, options)
@@ -0,0 +1,257 @@
+import codecs
+import os
+import posixpath
+import zipfile
+from html.parser import HTMLParser
+from xml.etree.ElementTree import iterparse
+
+import PyPDF2
+
+from utils import count_tokens, format_source_title
+
+CHUNK_SIZE = 64 * 1024  # bytes read per step / chars buffered before yielding
+
+FILE_TYPES = ["pdf", "txt", "md", "markdown", "html", "htm", "xhtml", "docx", "epub", "zip"]
+
+# Extension -> reader. Every reader takes a binary file-like object and
+# yields text chunks as it reads; build_source still joins them into one
+# content string per document, since that is what the analysis needs.
+READERS = {}
+
+
+def register_reader(*extensions):
+    """Register a reader function for one or more file extensions"""
+    def decorator(func):
+        for ext in extensions:
+            READERS[ext.lower().lstrip(".")] = func
+        return func
+    return decorator
+
+
+def file_extension(name):
+    """Lower-case extension of a file name, without the dot"""
+    return os.path.splitext(name)[1].lower().lstrip(".")
+
+
+# ------------------------------------------------------------------
+# FORMAT READERS
+# ------------------------------------------------------------------
+@register_reader("txt", "md", "markdown")
+def read_text(fileobj, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """Decode a byte stream incrementally, so multi-byte chars split across reads survive"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        raw = fileobj.read(chunk_size)
+        if not raw:
+            break
+        text = decoder.decode(raw)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Incremental HTML -> plain text, skipping scripts and styles"""
+
+    SKIP_TAGS = {"script", "style", "head", "noscript", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "section", "article", "blockquote",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "pre", "table", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def drain(self):
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+@register_reader("html", "htm", "xhtml")
+def read_html(fileobj, chunk_size=CHUNK_SIZE):
+    """Feed decoded chunks to an incremental HTML parser and yield the visible text"""
+    parser = _HTMLTextExtractor()
+    for chunk in read_text(fileobj, chunk_size):
+        parser.feed(chunk)
+        text = parser.drain()
+        if text:
+            yield text
+    parser.close()
+    text = parser.drain()
+    if text:
+        yield text
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_reader("docx")
+def read_docx(fileobj, chunk_size=CHUNK_SIZE):
+    """Stream paragraphs out of word/document.xml without building the full tree"""
+    with zipfile.ZipFile(fileobj) as archive, archive.open("word/document.xml") as xml:
+        parts, size = [], 0
+        for _, elem in iterparse(xml, events=("end",)):
+            if elem.tag == f"{_W_NS}t" and elem.text:
+                parts.append(elem.text)
+                size += len(elem.text)
+            elif elem.tag == f"{_W_NS}tab":
+                parts.append("\t")
+            elif elem.tag in (f"{_W_NS}br", f"{_W_NS}cr"):
+                parts.append("\n")
+            elif elem.tag == f"{_W_NS}p":
+                parts.append("\n")
+                elem.clear()  # drop the paragraph subtree we've already consumed
+                if size >= chunk_size:
+                    yield "".join(parts)
+                    parts, size = [], 0
+        if parts:
+            yield "".join(parts)
+
+
+def _epub_spine(archive):
+    """Return the reading-order list of XHTML members of an EPUB"""
+    names = set(archive.namelist())
+    try:
+        with archive.open("META-INF/container.xml") as container:
+            opf_path = next(
+                elem.get("full-path")
+                for _, elem in iterparse(container)
+                if elem.tag.endswith("rootfile")
+            )
+        manifest, spine = {}, []
+        with archive.open(opf_path) as opf:
+            for _, elem in iterparse(opf):
+                if elem.tag.endswith("}item"):
+                    manifest[elem.get("id")] = elem.get("href")
+                elif elem.tag.endswith("}itemref"):
+                    spine.append(elem.get("idref"))
+        base = posixpath.dirname(opf_path)
+        ordered = [posixpath.normpath(posixpath.join(base, manifest[i])) for i in spine if i in manifest]
+        ordered = [n for n in ordered if n in names]
+        if ordered:
+            return ordered
+    except (KeyError, StopIteration, SyntaxError):
+        pass
+    # Broken or missing OPF -> fall back to every HTML document in name order
+    return sorted(n for n in names if file_extension(n) in ("xhtml", "html", "htm"))
+
+
+@register_reader("epub")
+def read_epub(fileobj, chunk_size=CHUNK_SIZE):
+    """Stream the chapters of an EPUB in spine order"""
+    with zipfile.ZipFile(fileobj) as archive:
+        for member in _epub_spine(archive):
+            with archive.open(member) as chapter:
+                yield from read_html(chapter, chunk_size)
+            yield "\n\n"
+
+
+@register_reader("pdf")
+def read_pdf(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield PDF text page by page"""
+    try:
+        pdf_reader = PyPDF2.PdfReader(fileobj)
+        for page in pdf_reader.pages:
+            text = page.extract_text()
+            if text.strip():
+                yield text + "\n\n"
+    except Exception as e:
+        raise Exception(f"Error reading PDF: {str(e)}")
+
+
+# ------------------------------------------------------------------
+# DOCUMENT ITERATION / SOURCE BUILDING
+# ------------------------------------------------------------------
+def iter_documents(fileobj, name):
+    """
+    Yield (name, extension, chunk iterator) for every readable document in
+    ``fileobj``. Zip archives are expanded member by member and each member
+    is decompressed as a stream rather than read whole.
+    """
+    ext = file_extension(name)
+
+    if ext == "zip":
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                member_ext = file_extension(info.filename)
+                if info.is_dir() or member_ext not in READERS:
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member_ext, READERS[member_ext](member)
+        return
+
+    if ext not in READERS:
+        raise Exception(f"Unsupported file type: .{ext}")
+    yield name, ext, READERS[ext](fileobj)
+
+
+def build_source(name, ext, chunks):
+    """
+    Consume a chunk iterator into a source dict, counting tokens as chunks
+    arrive. Each chunk is counted up to its last whitespace so words split
+    across chunk boundaries are not counted twice.
+    """
+    parts, tokens, carry = [], 0, ""
+    for chunk in chunks:
+        parts.append(chunk)
+        pending = carry + chunk
+        cut = max(pending.rfind(" "), pending.rfind("\n"))
+        if cut == -1:
+            carry = pending
+            continue
+        tokens += count_tokens(pending[:cut])
+        carry = pending[cut:]
+    if carry:
+        tokens += count_tokens(carry)
+
+    content = "".join(parts).strip()
+    if not content:
+        return None
+
+    return {
+        "title": format_source_title(posixpath.basename(name), "📄"),
+        "content": content,
+        "tokens": tokens,
+        "meta": {"kind": ext, "name": name},
+    }
+
+
+def ingest_file(fileobj, name, max_sources, stats=None):
+    """
+    Yield sources extracted from ``fileobj`` until ``max_sources`` is reached.
+    Empty documents are skipped and do not count against the limit. If a
+    ``stats`` dict is given, ``stats["skipped"]`` is set to the number of
+    readable files left unread because the limit was reached (they are not
+    opened, so some of them may turn out to be empty).
+    """
+    added = skipped = 0
+    for doc_name, ext, chunks in iter_documents(fileobj, name):
+        if added >= max_sources:
+            skipped += 1
+            continue
+        source = build_source(doc_name, ext, chunks)
+        if source is None:
+            continue
+        yield source
+        added += 1
+    if stats is not None:
+        stats["skipped"] = skipped
@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from corpus import Corpus
+from utils import count_tokens, source_hash
+
+DEFAULT_LIBRARY_PATH = os.path.join(os.path.expanduser("~"), ".knowledge_agent", "library.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    hash       TEXT PRIMARY KEY,
+    title      TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    tokens     INTEGER NOT NULL,
+    meta       TEXT NOT NULL DEFAULT '{}',
+    added_at   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS corpora (
+    key          TEXT PRIMARY KEY,
+    source_count INTEGER NOT NULL,
+    tokens       INTEGER NOT NULL,
+    created_at   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS corpus_sources (
+    corpus_key  TEXT NOT NULL REFERENCES corpora(key),
+    position    INTEGER NOT NULL,
+    source_hash TEXT NOT NULL REFERENCES sources(hash),
+    PRIMARY KEY (corpus_key, position)
+);
+CREATE INDEX IF NOT EXISTS corpus_sources_by_source ON corpus_sources(source_hash);
+CREATE TABLE IF NOT EXISTS analyses (
+    cache_key     TEXT PRIMARY KEY,
+    corpus_key    TEXT NOT NULL REFERENCES corpora(key),
+    analysis_type TEXT NOT NULL,
+    output_length TEXT NOT NULL,
+    content       TEXT NOT NULL,
+    created_at    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_by_corpus ON analyses(corpus_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS sources_fts
+    USING fts5(title, content, content='sources', content_rowid='rowid');
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts
+    USING fts5(analysis_type, content, content='analyses', content_rowid='rowid');
+"""
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that matches all words, ignoring FTS syntax"""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+class Library:
+    """
+    Local, persistent store of every corpus and analysis, searchable with FTS5.
+
+    Sources are stored once by content hash; analyses are stored under the
+    same cache keys the app uses, so a repeated question is a primary-key lookup.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("KNOWLEDGE_AGENT_LIBRARY", DEFAULT_LIBRARY_PATH)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One connection shared across Streamlit sessions, serialised by a lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    # --------------------------------------------------------------
+    # WRITES
+    # --------------------------------------------------------------
+    def _add_source(self, source):
+        key = source_hash(source)
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO sources (hash, title, content, tokens, meta, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, source["title"], source["content"],
+             source["tokens"] if "tokens" in source else count_tokens(source["content"]),
+             json.dumps(source.get("meta", {})), int(time.time())),
+        )
+        if cur.rowcount:
+            self._conn.execute(
+                "INSERT INTO sources_fts (rowid, title, content) VALUES (?, ?, ?)",
+                (cur.lastrowid, source["title"], source["content"]),
+            )
+        return key
+
+    def add_corpus(self, sources):
+        """Store sources (deduplicated by hash) and the corpus they form; return its key"""
+        key = Corpus(sources).key()
+        with self._lock, self._conn:
+            hashes = [self._add_source(s) for s in sources]
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO corpora (key, source_count, tokens, created_at) "
+                "SELECT ?, ?, COALESCE(SUM(tokens), 0), ? FROM sources WHERE hash IN "
+                f"({','.join('?' * len(hashes))})",
+                (key, len(hashes), int(time.time()), *hashes),
+            )
+            if cur.rowcount:
+                self._conn.executemany(
+                    "INSERT INTO corpus_sources (corpus_key, position, source_hash) VALUES (?, ?, ?)",
+                    [(key, i, h) for i, h in enumerate(hashes)],
+                )
+        return key
+
+    def save_analysis(self, sources, analysis_type, output_length, content, cache_key):
+        """Store one lens result for a corpus under its analysis_cache_key"""
+        key = self.add_corpus(sources)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO analyses "
+                "(cache_key, corpus_key, analysis_type, output_length, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, key, analysis_type, output_length, content, int(time.time())),
+            )
+            if cur.rowcount:
+                self._conn.execute(
+                    "INSERT INTO analyses_fts (rowid, analysis_type, content) VALUES (?, ?, ?)",
+                    (cur.lastrowid, analysis_type, content),
+                )
+        return cache_key
+
+    # --------------------------------------------------------------
+    # READS
+    # --------------------------------------------------------------
+    def get_analysis(self, cache_key):
+        """Return a stored result for ``cache_key`` or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM analyses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row["content"] if row else None
+
+    def get_corpus_sources(self, key):
+        """Return the sources of a corpus, in their original order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.hash, s.title, s.content, s.tokens, s.meta FROM corpus_sources cs "
+                "JOIN sources s ON s.hash = cs.source_hash "
+                "WHERE cs.corpus_key = ? ORDER BY cs.position",
+                (key,),
+            ).fetchall()
+        return [
+            {"title": r["title"], "content": r["content"], "tokens": r["tokens"],
+             "hash": r["hash"], "meta": json.loads(r["meta"])}
+            for r in rows
+        ]
+
+    def get_corpus_analyses(self, key):
+        """Return {cache_key: {"analysis_type", "output_length", "content"}} for a corpus"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cache_key, analysis_type, output_length, content FROM analyses "
+                "WHERE corpus_key = ? ORDER BY created_at",
+                (key,),
+            ).fetchall()
+        return {
+            r["cache_key"]: {"analysis_type": r["analysis_type"],
+                             "output_length": r["output_length"],
+                             "content": r["content"]}
+            for r in rows
+        }
+
+    def search_sources(self, query, limit=20):
+        """Full-text search over stored source texts, best matches first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.hash, s.title, s.tokens, "
+                "snippet(sources_fts, 1, '**', '**', ' … ', 24) AS snippet "
+                "FROM sources_fts JOIN sources s ON s.rowid = sources_fts.rowid "
+                "WHERE sources_fts MATCH ? ORDER BY rank LIMIT ?",
+                (fts_query(query), limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def search_analyses(self, query, limit=20):
+        """Find past analyses mentioning ``query``, best matches first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.cache_key, a.corpus_key, a.analysis_type, a.output_length, a.created_at, "
+                "c.source_count, snippet(analyses_fts, 1, '**', '**', ' … ', 24) AS snippet "
+                "FROM analyses_fts JOIN analyses a ON a.rowid = analyses_fts.rowid "
+                "JOIN corpora c ON c.key = a.corpus_key "
+                "WHERE analyses_fts MATCH ? ORDER BY rank LIMIT ?",
+                (fts_query(query), limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def recent_analyses(self, limit=20):
+        """Most recent analyses, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.cache_key, a.corpus_key, a.analysis_type, a.output_length, a.created_at, "
+                "c.source_count, substr(a.content, 1, 200) AS snippet "
+                "FROM analyses a JOIN corpora c ON c.key = a.corpus_key "
+                "ORDER BY a.created_at DESC, a.rowid DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self):
+        """Counts of stored sources, corpora and analyses"""
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("sources", "corpora", "analyses")
+            }
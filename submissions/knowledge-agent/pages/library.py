@@ -0,0 +1,10 @@
+import streamlit as st
+from ui.library import render_library_page
+
+st.set_page_config(
+    page_title="KnowledgeAgent Library",
+    page_icon="📚",
+    layout="wide",
+)
+
+render_library_page()
@@ -0,0 +1,81 @@
+import threading
+
+from agents import create_model, create_notes_agent
+from utils import normalise_payload, source_hash
+
+PREFETCH_WORKERS = 4
+
+# Lenses whose per-source (map) work can run before the other sources exist.
+# The reduce step later combines the notes into the final answer.
+MAP_INSTRUCTIONS = {
+    "📄 Summary": "Write dense notes of this source's main points, arguments and conclusions.",
+    "🎯 Key Points": "List every important takeaway of this source as short bullet points.",
+}
+
+
+def run_map_stage(text, analysis_type, api_key, base_url, model_id):
+    """Condense one source into notes for ``analysis_type`` (blocking; runs in a worker thread)"""
+    prompt = f"""
+    Prepare notes for this analysis type: {analysis_type}
+    {MAP_INSTRUCTIONS[analysis_type]}
+
+    Source text:
+    {text}
+    """
+    agent = create_notes_agent(create_model(api_key, base_url, model_id))
+    response = agent.run(prompt)
+    return normalise_payload(analysis_type, response.content)
+
+
+class Prefetcher:
+    """
+    Background map-stage work keyed by (source hash, lens, endpoint, model).
+
+    Work for a removed source is cancelled if it has not started yet; if it
+    is already running, its result is simply dropped. The executor is
+    passed in so that sessions can share one bounded pool.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, source, analysis_types, api_key, base_url, model_id):
+        """Start map-stage work for a source unless it is already running or done"""
+        h = source_hash(source)
+        with self._lock:
+            for analysis_type in analysis_types:
+                key = (h, analysis_type, base_url, model_id)
+                future = self._futures.get(key)
+                # Retry earlier failures; keep running or successful work
+                if future is not None and not (future.done() and future.exception() is not None):
+                    continue
+                self._futures[key] = self._executor.submit(
+                    run_map_stage, source["content"], analysis_type, api_key, base_url, model_id
+                )
+
+    def cancel(self, source):
+        """Cancel / forget every piece of work for a source"""
+        h = source_hash(source)
+        with self._lock:
+            for key in [k for k in self._futures if k[0] == h]:
+                self._futures.pop(key).cancel()
+
+    def cancel_all(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def prefetched_futures(self, sources, analysis_type, base_url, model_id):
+        """
+        Futures of per-source notes in source order, or None unless every
+        source already has work scheduled that has not failed or been cancelled.
+        """
+        with self._lock:
+            futures = [self._futures.get((source_hash(s), analysis_type, base_url, model_id)) for s in sources]
+        for f in futures:
+            if f is None or f.cancelled() or (f.done() and f.exception() is not None):
+                return None
+        return futures
@@ -0,0 +1,227 @@
+import asyncio
+import math
+import re
+from difflib import SequenceMatcher
+
+from pydantic import ValidationError
+
+from agents import Quiz, QuizItem, create_quiz_agent
+from utils import normalise_payload
+
+QUIZ_TYPE = "📝 Knowledge Check"
+
+MAX_QUIZ_ITEMS = 500
+MAX_ITEMS_PER_CALL = 20        # larger asks degrade quality and overflow JSON mode
+QUIZ_CHUNK_CHARS = 24_000      # ~6K tokens of source text per call
+MIN_QUIZ_CHUNK_CHARS = 4_000   # never cut a source into fragments smaller than this
+CHARS_PER_ITEM = 400           # a source supports at most one question per this many chars
+QUIZ_CONCURRENCY = 6
+OVERSAMPLE = 1.3               # ask for extra items to absorb duplicates / invalid ones
+DUPLICATE_THRESHOLD = 0.85     # SequenceMatcher ratio above which questions are duplicates
+
+
+# ------------------------------------------------------------------
+# PLANNING
+# ------------------------------------------------------------------
+def balanced_shares(total, buckets):
+    """Split ``total`` into ``buckets`` near-equal integer shares"""
+    base, extra = divmod(total, buckets)
+    return [base + (1 if i < extra else 0) for i in range(buckets)]
+
+
+def source_shares(sources, total_items):
+    """
+    Split ``total_items`` across sources as evenly as their size allows.
+    A source gets at most one item per CHARS_PER_ITEM characters; what a short
+    source cannot take is handed to the others. The shares may add up to
+    less than ``total_items`` when every source is at its cap.
+    """
+    caps = [max(1, len(s["content"]) // CHARS_PER_ITEM) for s in sources]
+    shares = [0] * len(sources)
+    open_indices = list(range(len(sources)))
+    while open_indices and sum(shares) < total_items:
+        extra = balanced_shares(total_items - sum(shares), len(open_indices))
+        for index, more in zip(open_indices, extra):
+            shares[index] += min(more, caps[index] - shares[index])
+        open_indices = [i for i in open_indices if shares[i] < caps[i]]
+    return shares
+
+
+def split_text(text, pieces):
+    """
+    Split text into at most ``pieces`` parts, preferring paragraph / line breaks.
+    Parts are never shorter than MIN_QUIZ_CHUNK_CHARS (except a text that is
+    shorter than that as a whole).
+    """
+    pieces = min(pieces, max(1, len(text) // MIN_QUIZ_CHUNK_CHARS))
+    if pieces <= 1:
+        return [text]
+    target = math.ceil(len(text) / pieces)
+    parts, start = [], 0
+    while start < len(text) and len(parts) < pieces - 1:
+        end = min(start + target, len(text))
+        window = text[start:end]
+        cut = max(window.rfind("\n\n"), window.rfind("\n"))
+        if cut > target // 2:
+            end = start + cut
+        parts.append(text[start:end])
+        start = end
+    tail = text[start:]
+    if parts and len(tail) < MIN_QUIZ_CHUNK_CHARS:
+        parts[-1] += tail
+    else:
+        parts.append(tail)
+    return [p for p in parts if p.strip()]
+
+
+def plan_quiz_jobs(sources, total_items):
+    """
+    Return a list of jobs {"source_index", "text", "count"}.
+    Items are shared across sources by source_shares. Each source is split by
+    size only (QUIZ_CHUNK_CHARS) and its calls are spread evenly over the
+    chunks, so a small share still samples the whole text; when a share needs
+    more calls than there are chunks, chunks are reused and the deduper absorbs
+    the overlap. Every job asks for a few more items than needed to absorb
+    dedup losses.
+    """
+    jobs = []
+    for index, (source, share) in enumerate(zip(sources, source_shares(sources, total_items))):
+        if not share:
+            continue
+        text = source["content"]
+        chunks = split_text(text, math.ceil(len(text) / QUIZ_CHUNK_CHARS))
+        calls = min(share, max(len(chunks), math.ceil(share * OVERSAMPLE / MAX_ITEMS_PER_CALL)))
+        for call, call_share in enumerate(balanced_shares(share, calls)):
+            jobs.append({
+                "source_index": index,
+                # Midpoint of the call's slice of the text
+                "text": chunks[(2 * call + 1) * len(chunks) // (2 * calls)],
+                "count": min(MAX_ITEMS_PER_CALL, math.ceil(call_share * OVERSAMPLE)),
+            })
+    return jobs
+
+
+# ------------------------------------------------------------------
+# VALIDATION / DEDUPLICATION
+# ------------------------------------------------------------------
+def parse_quiz_items(raw):
+    """Validate an agent response against Quiz and drop malformed items"""
+    if isinstance(raw, Quiz):
+        quiz = raw
+    else:
+        try:
+            quiz = Quiz.model_validate_json(normalise_payload(QUIZ_TYPE, raw))
+        except ValidationError:
+            return []
+
+    return [
+        item for item in quiz.questions
+        if item.question.strip()
+        and len(item.options) >= 2
+        and 0 <= item.correct_index < len(item.options)
+    ]
+
+
+def _normalise_question(text):
+    return re.sub(r"[^a-z0-9 ]+", "", text.lower()).split()
+
+
+class QuestionDeduper:
+    """Rejects questions that are (near-)duplicates of ones already accepted"""
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._seen = []          # (normalised string, word set)
+        self._exact = set()
+
+    def is_duplicate(self, item: QuizItem):
+        words = _normalise_question(item.question)
+        norm = " ".join(words)
+        if norm in self._exact:
+            return True
+        word_set = set(words)
+        for other_norm, other_set in self._seen:
+            # Cheap word-overlap prefilter before the quadratic ratio
+            union = len(word_set | other_set) or 1
+            if len(word_set & other_set) / union < 0.5:
+                continue
+            if SequenceMatcher(None, norm, other_norm).ratio() >= self.threshold:
+                return True
+        return False
+
+    def add(self, item: QuizItem):
+        """Accept the item unless it duplicates an earlier one; return whether it was accepted"""
+        if self.is_duplicate(item):
+            return False
+        words = _normalise_question(item.question)
+        norm = " ".join(words)
+        self._exact.add(norm)
+        self._seen.append((norm, set(words)))
+        return True
+
+
+# ------------------------------------------------------------------
+# GENERATION
+# ------------------------------------------------------------------
+async def _run_job(model, job, output_length, semaphore):
+    prompt = f"""
+    Write exactly {job['count']} multiple-choice questions about the text below.
+    Cover distinct facts spread over the whole text; do not repeat questions.
+    Desired difficulty / detail level: {output_length}
+
+    Text:
+    {job['text']}
+    """
+    async with semaphore:
+        try:
+            # One agent per call: agno agents keep per-run state on the instance
+            response = await create_quiz_agent(model).arun(prompt)
+        except Exception as e:
+            # Other jobs may still fill the quiz; the error is kept for the caller
+            return job, [], e
+    return job, parse_quiz_items(response.content), None
+
+
+async def generate_quiz(model, sources, total_items, output_length, on_batch=None):
+    """
+    Generate up to ``total_items`` deduplicated questions balanced across sources.
+
+    Jobs run concurrently; after each finishes, accepted items are reported
+    through ``on_batch(items_so_far, total_items)``. Returns a Quiz, which may
+    hold fewer than ``total_items`` questions; if none could be produced, the
+    first job error (if any) is raised.
+    """
+    total_items = min(total_items, MAX_QUIZ_ITEMS)
+    shares = source_shares(sources, total_items)
+    per_source = [0] * len(sources)
+    accepted, overflow = [], []
+    first_error = None
+    deduper = QuestionDeduper()
+    semaphore = asyncio.Semaphore(QUIZ_CONCURRENCY)
+
+    tasks = [_run_job(model, job, output_length, semaphore) for job in plan_quiz_jobs(sources, total_items)]
+    for finished in asyncio.as_completed(tasks):
+        job, items, error = await finished
+        first_error = first_error or error
+        index = job["source_index"]
+        for item in items:
+            if per_source[index] >= shares[index]:
+                overflow.append(item)
+            elif deduper.add(item):
+                accepted.append(item)
+                per_source[index] += 1
+        if on_batch:
+            on_batch(accepted, total_items)
+
+    # Sources that came up short are backfilled with other sources' extras
+    for item in overflow:
+        if len(accepted) >= total_items:
+            break
+        if deduper.add(item):
+            accepted.append(item)
+
+    if not accepted:
+        if first_error is not None:
+            raise first_error
+        raise Exception("Knowledge Check generation returned no valid questions")
+    return Quiz(questions=accepted[:total_items])
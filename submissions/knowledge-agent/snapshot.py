@@ -0,0 +1,114 @@
+"""
+Session snapshots: a gzip-compressed JSON Lines file with one record per line.
+
+    {"type": "header", "format": "knowledge-agent-session", "version": 1, ...}
+    {"type": "source", "title": ..., "content": ..., "tokens": ..., "hash": ..., "meta": {...}}
+    {"type": "result", "cache_key": ..., "corpus_key": ..., "analysis_type": ..., "content": ..., "shown": true}
+
+Records are serialised and parsed one line at a time, so no JSON document for
+the whole session is ever built; the compressed bytes live wherever the
+caller's file object puts them.
+"""
+import gzip
+import io
+import json
+import time
+
+from corpus import Corpus
+from utils import count_tokens, source_hash
+
+SNAPSHOT_FORMAT = "knowledge-agent-session"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = "jsonl.gz"
+
+
+def _write_record(stream, record):
+    stream.write(json.dumps(record, ensure_ascii=False))
+    stream.write("\n")
+
+
+def write_snapshot(fileobj, sources, analysis_cache, result_keys):
+    """
+    Stream a snapshot into a binary file object.
+
+    ``analysis_cache`` maps cache keys to {"analysis_type", "content", "corpus_key"};
+    ``result_keys`` maps the currently displayed lenses to their cache keys.
+    Only the displayed results and other results computed over these same
+    sources are written; the cache may also hold entries for earlier corpora.
+    """
+    shown = set(result_keys.values())
+    corpus_key = Corpus(sources).key()
+    with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz, \
+            io.TextIOWrapper(gz, encoding="utf-8") as stream:
+        _write_record(stream, {
+            "type": "header",
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": int(time.time()),
+        })
+        for s in sources:
+            _write_record(stream, {
+                "type": "source",
+                "title": s["title"],
+                "content": s["content"],
+                "tokens": s["tokens"] if "tokens" in s else count_tokens(s["content"]),
+                "hash": source_hash(s),
+                "meta": s.get("meta", {}),
+            })
+        for key, entry in analysis_cache.items():
+            if key not in shown and entry.get("corpus_key") != corpus_key:
+                continue
+            _write_record(stream, {
+                "type": "result",
+                "cache_key": key,
+                "corpus_key": entry.get("corpus_key"),
+                "analysis_type": entry["analysis_type"],
+                "content": entry["content"],
+                "shown": key in shown,
+            })
+
+
+def iter_snapshot(fileobj):
+    """Yield snapshot records one by one, validating the header first"""
+    with gzip.GzipFile(fileobj=fileobj, mode="rb") as gz, \
+            io.TextIOWrapper(gz, encoding="utf-8") as stream:
+        try:
+            header = json.loads(next(stream))
+        except (StopIteration, json.JSONDecodeError, OSError):
+            raise Exception("Not a KnowledgeAgent session snapshot")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise Exception("Not a KnowledgeAgent session snapshot")
+        if header.get("version", 0) > SNAPSHOT_VERSION:
+            raise Exception(f"Snapshot version {header['version']} is newer than this app supports")
+
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_snapshot(fileobj, max_sources):
+    """
+    Load a snapshot into (sources, analysis_cache, result_keys).
+    Sources beyond ``max_sources`` are dropped.
+    """
+    sources, analysis_cache, result_keys = [], {}, {}
+    for record in iter_snapshot(fileobj):
+        if record["type"] == "source":
+            if len(sources) >= max_sources:
+                continue
+            sources.append({
+                "title": record["title"],
+                "content": record["content"],
+                "tokens": record["tokens"],
+                "hash": record["hash"],
+                "meta": record.get("meta", {}),
+            })
+        elif record["type"] == "result":
+            analysis_cache[record["cache_key"]] = {
+                "analysis_type": record["analysis_type"],
+                "content": record["content"],
+                "corpus_key": record.get("corpus_key"),
+            }
+            if record.get("shown"):
+                result_keys[record["analysis_type"]] = record["cache_key"]
+    return sources, analysis_cache, result_keys
@@ -1,8 +1,13 @@
 import json
 import streamlit as st
 import asyncio
-from agents import create_analysis_team
-from utils import combine_sources, create_download_button, strip_code_fences, render_dot_quickchart, normalise_payload
+from agents import create_analysis_team, create_model
+from quiz import QUIZ_TYPE, MAX_QUIZ_ITEMS, generate_quiz
+from ui.library import get_library
+from ui.prefetch import get_prefetcher, prefetch_enabled
+from prefetch import MAP_INSTRUCTIONS
+from utils import create_download_button, strip_code_fences, dot_quickchart_url, normalise_payload
+from corpus import Corpus
 import pandas as pd
 
 ANALYSIS_OPTIONS = {
@@ -12,10 +17,41 @@ ANALYSIS_OPTIONS = {
     "🎯 Key Points": {"selected": False, "help": "A bulleted list of the most important takeaways."},
     "🔗 Intersections": {"selected": False, "help": "Table of overlaps across sources."},
     "🧭 Topic Coverage": {"selected": False, "help": "Heat-map of which source covers which sub-topic."},
-    "📝 Knowledge Check": {"selected": False, "help": "Generate 5–10 MCQs with answer key."},
+    "📝 Knowledge Check": {"selected": False, "help": "Generate a bank of MCQs with answer key, balanced across sources."},
 }
 
 
+def init_analysis_state():
+    """Initialize analysis-related session state"""
+    if "analysis_cache" not in st.session_state:
+        st.session_state.analysis_cache = {}     # cache_key -> {"analysis_type", "content", "corpus_key"}
+    if "result_keys" not in st.session_state:
+        st.session_state.result_keys = {}        # analysis_type -> cache_key currently shown
+
+
+def current_results():
+    """Results currently shown, resolved from the analysis cache"""
+    cache = st.session_state.analysis_cache
+    return {
+        analysis_type: cache[key]["content"]
+        for analysis_type, key in st.session_state.result_keys.items()
+        if key in cache
+    }
+
+
+def lens_widget_key(analysis_type):
+    """Session-state key of a lens checkbox"""
+    return f"lens_{analysis_type}"
+
+
+def selected_lenses():
+    """Lenses currently ticked, falling back to the defaults before the checkboxes are drawn"""
+    return [
+        name for name, props in ANALYSIS_OPTIONS.items()
+        if st.session_state.get(lens_widget_key(name), props["selected"])
+    ]
+
+
 def render_analysis_config():
     """Render analysis configuration options"""
     st.markdown("## 2. Configure Your Analysis")
@@ -28,7 +64,7 @@ def render_analysis_config():
 
         selected_analysis_keys = []
         for name, props in ANALYSIS_OPTIONS.items():
-            if st.checkbox(name, value=props["selected"], help=props["help"]):
+            if st.checkbox(name, value=props["selected"], help=props["help"], key=lens_widget_key(name)):
                 selected_analysis_keys.append(name)
 
     with col_detail:
@@ -42,10 +78,21 @@ def render_analysis_config():
             label_visibility="collapsed"
         )
 
-    return selected_analysis_keys, output_length
+        quiz_items = 10
+        if QUIZ_TYPE in selected_analysis_keys:
+            quiz_items = st.number_input(
+                "📝 Knowledge Check questions:",
+                min_value=5,
+                max_value=MAX_QUIZ_ITEMS,
+                value=10,
+                step=5,
+                help="Questions are generated per source in parallel, deduplicated and balanced across sources."
+            )
+
+    return selected_analysis_keys, output_length, quiz_items
 
 
-def render_analysis_button(api_key, base_url, model_id, selected_analysis_keys, output_length):
+def render_analysis_button(api_key, base_url, model_id, selected_analysis_keys, output_length, quiz_items=10):
     """Render the main analysis button and handle processing"""
     st.markdown("---")
 
@@ -66,42 +113,172 @@ def render_analysis_button(api_key, base_url, model_id, selected_analysis_keys,
             st.warning("❗ No Analysis Selected: Please choose at least one analysis type.", icon="🧪")
             return None
 
-        return process_analysis(api_key, base_url, model_id, selected_analysis_keys, output_length)
+        return process_analysis(api_key, base_url, model_id, selected_analysis_keys, output_length, quiz_items)
 
     return None
 
 
-def process_analysis(api_key, base_url, model_id, selected_analysis_keys, output_length):
-    """Process the analysis with the team of agents"""
+def process_analysis(api_key, base_url, model_id, selected_analysis_keys, output_length, quiz_items=10):
+    """Process the analysis with the team of agents, reusing cached lens results"""
     try:
-        team = create_analysis_team(api_key, base_url, model_id)
-        combined_content = combine_sources(st.session_state.sources)
-
-        # Status message
-        source_count = len(st.session_state.sources)
-        status_verb = "analyzing your source" if source_count == 1 else f"analyzing {source_count} combined sources"
-        status_message = f"🧠 Your AI team is {status_verb} for {len(selected_analysis_keys)} tasks..."
-
-        with st.spinner(status_message):
-            results = asyncio.run(run_analysis_tasks(
-                team, combined_content, selected_analysis_keys, output_length
-            ))
-
-        st.success(f"🎉 Insights Uncovered! All {len(selected_analysis_keys)} analyses complete.")
-        st.balloons()
-
-        return results
+        sources = st.session_state.sources
+        corpus = Corpus(sources)
+        corpus_key = corpus.key()
+        cache = st.session_state.analysis_cache
+        keys = {
+            t: corpus.cache_key(t, output_length, model_id, base_url,
+                                {"items": quiz_items} if t == QUIZ_TYPE else None)
+            for t in selected_analysis_keys
+        }
+        library = get_library()
+
+        def is_cached(analysis_type, key):
+            # Answers already in the local library are a lookup, not a new LLM run
+            if key not in cache:
+                stored = library.get_analysis(key)
+                if stored is not None:
+                    cache[key] = {"analysis_type": analysis_type, "content": stored, "corpus_key": corpus_key}
+            return key in cache
+
+        pending = [t for t in selected_analysis_keys if not is_cached(t, keys[t])]
+
+        # Lenses whose per-source notes were prefetched at add time only need
+        # the reduce step. Their answers are keyed separately from full-corpus runs.
+        partials, reduce_keys = {}, {}
+        if pending and prefetch_enabled():
+            prefetcher = get_prefetcher()
+            for t in [t for t in pending if t in MAP_INSTRUCTIONS]:
+                futures = prefetcher.prefetched_futures(sources, t, base_url, model_id)
+                if futures is None:
+                    continue
+                reduce_keys[t] = corpus.cache_key(t, output_length, model_id, base_url, {"mode": "map_reduce"})
+                if is_cached(t, reduce_keys[t]):
+                    keys[t] = reduce_keys[t]
+                    pending.remove(t)
+                else:
+                    partials[t] = futures
+
+        if pending:
+            new_team = lambda: create_analysis_team(api_key, base_url, model_id)
+
+            # Status message
+            source_count = len(sources)
+            status_verb = "analyzing your source" if source_count == 1 else f"analyzing {source_count} combined sources"
+            status_message = f"🧠 Your AI team is {status_verb} for {len(pending)} tasks..."
+
+            quiz_runner = quiz_live = None
+            if QUIZ_TYPE in pending:
+                # Accepted questions appear here batch by batch until the tabs are drawn
+                quiz_live = st.empty()
+                on_batch = quiz_progress_callback(quiz_live)
+                model = create_model(api_key, base_url, model_id)
+                quiz_runner = lambda: generate_quiz(model, sources, quiz_items, output_length, on_batch)
+
+            with st.spinner(status_message):
+                fresh, reduced = asyncio.run(run_analysis_tasks(
+                    new_team, corpus, pending, output_length, quiz_runner, partials
+                ))
+            if quiz_live is not None:
+                quiz_live.empty()   # the Knowledge Check tab now shows the full bank
+
+            for analysis_type, content in fresh.items():
+                if analysis_type in reduced:
+                    keys[analysis_type] = reduce_keys[analysis_type]
+                cache[keys[analysis_type]] = {"analysis_type": analysis_type, "content": content,
+                                              "corpus_key": corpus_key}
+                library.save_analysis(sources, analysis_type, output_length, content,
+                                      cache_key=keys[analysis_type])
+
+            if QUIZ_TYPE in fresh:
+                produced = len(json.loads(fresh[QUIZ_TYPE])["questions"])
+                requested = min(quiz_items, MAX_QUIZ_ITEMS)
+                if produced < requested:
+                    st.warning(f"❗ {QUIZ_TYPE} has {produced} of the {requested} questions requested; "
+                               "the sources may be too short or some generation calls failed.", icon="⚠️")
+
+        st.session_state.result_keys = keys
+        reused = len(selected_analysis_keys) - len(pending)
+        reused_note = f" ({reused} reused from cache or library)" if reused else ""
+        st.success(f"🎉 Insights Uncovered! All {len(selected_analysis_keys)} analyses complete{reused_note}.")
+        if pending:
+            st.balloons()
+
+        return current_results()
 
     except Exception as e:
         st.error(f"🚧 An error occurred during analysis: {str(e)}")
         return None
 
 
-async def run_analysis_tasks(team, combined_content, selected_analysis_keys, output_length):
-    """Run analysis tasks asynchronously"""
+def render_quiz_items(items):
+    """Render quiz items (dicts) as Q&A cards with collapsible answers"""
+    for idx, item in enumerate(items, 1):
+        st.markdown(f"**Q{idx}. {item['question']}**")
+        for j, opt in enumerate(item["options"]):
+            st.markdown(f"- **{chr(65+j)}.** {opt}")
+        with st.expander("Show answer"):
+            st.markdown(f"**Correct:** {chr(65 + item['correct_index'])}")
+        st.markdown("---")
+
+
+def quiz_progress_callback(placeholder):
+    """Return an on_batch callback that streams accepted quiz items into ``placeholder``"""
+    def on_batch(items, total):
+        with placeholder.container():
+            st.markdown(f"### {QUIZ_TYPE} (live)")
+            st.progress(min(len(items) / total, 1.0),
+                        text=f"{len(items)}/{total} questions ready")
+            render_quiz_items([item.model_dump() for item in items])
+    return on_batch
+
+
+async def reduce_partials(team, analysis_type, output_length, futures):
+    """Combine prefetched per-source notes into the final result"""
+    notes = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    combined_notes = "\n\n--- Source Separator ---\n\n".join(
+        [f"Source {i + 1} notes:\n{n}" for i, n in enumerate(notes)]
+    )
+    prompt = f"""
+    You are analyzing a collection of text sources provided by the user.
+    Each source was already condensed into notes; the notes are separated by '--- Source Separator ---'.
+    Treat the notes as the full content of the sources.
+
+    Analysis type to perform: {analysis_type}
+    Desired output detail level: {output_length}
+
+    Notes from all sources:
+    {combined_notes}
+    """
+    response = await team.arun(prompt)
+    return normalise_payload(analysis_type, response.content)
+
+
+async def run_analysis_tasks(new_team, corpus, selected_analysis_keys, output_length, quiz_runner=None, partials=None):
+    """
+    Run analysis tasks asynchronously.
+    Every lens gets its own team from ``new_team()``: an agno team keeps the
+    messages of its runs, so a team shared by all lenses would hold every
+    full-corpus prompt until the analysis ends.
+    Returns ({analysis_type: content}, set of lenses answered from prefetched notes).
+    """
+    partials = partials or {}
+    reduced = set()
 
     async def process_single_analysis(analysis_type):
-        prompt = f"""
+        # Knowledge Check runs its own per-source pipeline instead of one team call
+        if analysis_type == QUIZ_TYPE and quiz_runner is not None:
+            quiz = await quiz_runner()
+            return analysis_type, quiz.model_dump_json()
+
+        if analysis_type in partials:
+            try:
+                content = await reduce_partials(new_team(), analysis_type, output_length, partials[analysis_type])
+                reduced.add(analysis_type)
+                return analysis_type, content
+            except Exception:
+                pass  # a map step failed or was cancelled -> analyze the full corpus instead
+
+        header = f"""
         You are analyzing a collection of text sources provided by the user.
         The sources are concatenated and separated by '--- Source Separator ---'.
         Each source is also prefixed with "Source X:" to help you differentiate if needed.
@@ -110,16 +287,17 @@ async def run_analysis_tasks(team, combined_content, selected_analysis_keys, out
         Desired output detail level: {output_length}
 
         Combined text from all sources:
-        {combined_content}
         """
-        response = await team.arun(prompt)
+        # The corpus is joined straight into the prompt; no combined copy is kept,
+        # and the prompt is released with this lens' team once the call returns
+        response = await new_team().arun(corpus.render(prefix=header, suffix="\n"))
         clean = normalise_payload(analysis_type, response.content)
         return analysis_type, clean
 
     tasks = [process_single_analysis(analysis_type) for analysis_type in selected_analysis_keys]
     results_list = await asyncio.gather(*tasks)
 
-    return {res_type: res_content for res_type, res_content in results_list}
+    return {res_type: res_content for res_type, res_content in results_list}, reduced
 
 
 # ------------------------------------------------------------------
@@ -146,48 +324,76 @@ def render_results(results):
 
 
 # ------------------------------------------------------------------
-# HELPER: renders a single block by type
+# HELPER: pre-parses a block once per (type, content) and caches it
 # ------------------------------------------------------------------
-def _render_block(analysis_type: str, content: str):
-    st.markdown(f"### {analysis_type}")
+RENDER_CACHE_ENTRIES = 64
 
+
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def prepare_block(analysis_type: str, content: str):
+    """
+    Do all post-processing of a result once; reruns get the cached payload.
+    Returns (kind, data) where kind is one of
+    "dataframe", "quiz", "quiz_error", "concept_map" or "markdown".
+    """
     # --- 1. Topic Coverage -> DataFrame --------------------------
     if analysis_type == "🧭 Topic Coverage":
         if content.lstrip().startswith("{"):  # came as {"csv":"..."}
-                content = json.loads(content)["csv"]
+            content = json.loads(content)["csv"]
         # Safe parsing
         lines = [l for l in content.strip().splitlines() if l]
         header = lines[0].split(",", 1)              # ['Topic', 'Source 1']
         rows = [line.split(",", 1) for line in lines[1:]]
+        return "dataframe", pd.DataFrame(rows, columns=header)
 
-        df = pd.DataFrame(rows, columns=header)
-        st.dataframe(df, use_container_width=True)
-        return
-
-    # --- 2. Knowledge Check -> collapsible Q&A cards -------------
+    # --- 2. Knowledge Check -> list of quiz items -----------------
     if analysis_type == "📝 Knowledge Check":
         try:
-            items = json.loads(content)["questions"]
-        except Exception as e:
-            st.warning(f"⚠️ Couldn’t decode quiz JSON.\n\nRaw payload:\n{content}")
-            return
-
-        for idx, item in enumerate(items, 1):
-            st.markdown(f"**Q{idx}. {item['question']}**")
-            for j, opt in enumerate(item["options"]):
-                st.markdown(f"- **{chr(65+j)}.** {opt}")
-            with st.expander("Show answer"):
-                st.markdown(f"**Correct:** {chr(65 + item['correct_index'])}")
-            st.markdown("---")
-        return
+            return "quiz", json.loads(content)["questions"]
+        except Exception:
+            return "quiz_error", content
 
-    # --- 3. Concept Map -> quickchart PNG ------------------------
+    # --- 3. Concept Map -> quickchart PNG URL -------------------
     if analysis_type == "🗺️ Concept Map":
-        render_dot_quickchart(strip_code_fences(content))
+        return "concept_map", dot_quickchart_url(strip_code_fences(content))
+
+    # --- 4. Default -> cleaned markdown --------------------------
+    return "markdown", strip_code_fences(content)
+
+
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def build_combined_export(results_items: tuple) -> str:
+    """Join every result into the "all insights" markdown export"""
+    return "\n\n---\n\n".join(
+        [f"# {res_type}\n\n{res_content}" for res_type, res_content in results_items]
+    )
+
+
+# ------------------------------------------------------------------
+# HELPER: renders a single block by type
+# ------------------------------------------------------------------
+def _render_block(analysis_type: str, content: str):
+    st.markdown(f"### {analysis_type}")
+
+    kind, data = prepare_block(analysis_type, content)
+
+    if kind == "dataframe":
+        st.dataframe(data, use_container_width=True)
+        return
+
+    if kind == "quiz_error":
+        st.warning(f"⚠️ Couldn’t decode quiz JSON.\n\nRaw payload:\n{data}")
         return
 
-    # --- 4. Default -> markdown ---------------------------------
-    st.markdown(strip_code_fences(content), unsafe_allow_html=True)
+    if kind == "quiz":
+        render_quiz_items(data)
+        return
+
+    if kind == "concept_map":
+        st.image(data, width=700)
+        return
+
+    st.markdown(data, unsafe_allow_html=True)
 
 def render_download_section(results):
     """Render download buttons for results"""
@@ -196,9 +402,7 @@ def render_download_section(results):
 
     if len(results) > 1:
         # Combined download
-        all_results_content = "\n\n---\n\n".join(
-            [f"# {res_type}\n\n{res_content}" for res_type, res_content in results.items()]
-        )
+        all_results_content = build_combined_export(tuple(results.items()))
         create_download_button(
             label="📥 Download All Insights (Combined File)",
             data=all_results_content,
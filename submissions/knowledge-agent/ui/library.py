@@ -0,0 +1,82 @@
+import time
+import streamlit as st
+from library import Library
+
+
+@st.cache_resource
+def get_library():
+    """One Library per server process, shared by every session"""
+    return Library()
+
+
+def render_library_page():
+    """Search page over every corpus and analysis stored in the local library"""
+    from ui.sources import init_source_state
+    from ui.analysis import init_analysis_state, _render_block
+
+    init_source_state()
+    init_analysis_state()
+    library = get_library()
+
+    st.markdown("<h1 style='text-align: center; color: #333;'>📚 Knowledge Library</h1>", unsafe_allow_html=True)
+    stats = library.stats()
+    st.caption(f"{stats['corpora']:,} corpora · {stats['sources']:,} sources · "
+               f"{stats['analyses']:,} analyses stored in `{library.path}`")
+    st.markdown("---")
+
+    col_query, col_scope = st.columns([3, 1])
+    with col_query:
+        query = st.text_input("🔎 Search", placeholder="Find analyses or sources mentioning…").strip()
+    with col_scope:
+        scope = st.radio("Search in:", options=["Analyses", "Sources"], horizontal=True)
+
+    if scope == "Sources":
+        if not query:
+            st.info("ℹ️ Type a word or phrase to search stored source texts.", icon="ℹ️")
+            return
+        hits = library.search_sources(query)
+        if not hits:
+            st.warning("❗ No sources match your search.", icon="🔎")
+        for hit in hits:
+            with st.container(border=True):
+                st.markdown(f"**{hit['title']}** · {hit['tokens']:,} tokens")
+                st.markdown(hit["snippet"])
+        return
+
+    hits = library.search_analyses(query) if query else library.recent_analyses()
+    if not hits:
+        st.warning("❗ No analyses found." if query else "ℹ️ The library is empty — run an analysis first.")
+        return
+    if not query:
+        st.markdown("#### Recent analyses")
+
+    for hit in hits:
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["created_at"]))
+        label = (f"{hit['analysis_type']} · {hit['output_length']} · "
+                 f"{hit['source_count']} source(s) · {created}")
+        # A bordered container, not an expander: quiz results use expanders themselves
+        with st.container(border=True):
+            st.markdown(f"**{label}**")
+            st.caption(hit["snippet"])
+            if st.toggle("Show full result", key=f"show_{hit['cache_key']}"):
+                _render_block(hit["analysis_type"], library.get_analysis(hit["cache_key"]))
+            if st.button("📂 Open this corpus", key=f"open_{hit['cache_key']}", use_container_width=True):
+                open_corpus(library, hit["corpus_key"])
+
+
+def open_corpus(library, corpus_key):
+    """Load a stored corpus and its analyses into the workspace"""
+    from ui.prefetch import cancel_prefetch
+
+    cancel_prefetch()
+    st.session_state.sources = library.get_corpus_sources(corpus_key)
+    result_keys = {}
+    for key, entry in library.get_corpus_analyses(corpus_key).items():
+        st.session_state.analysis_cache[key] = {
+            "analysis_type": entry["analysis_type"],
+            "content": entry["content"],
+            "corpus_key": corpus_key,
+        }
+        result_keys[entry["analysis_type"]] = key   # latest run of each lens wins
+    st.session_state.result_keys = result_keys
+    st.switch_page("app.py")
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from prefetch import MAP_INSTRUCTIONS, PREFETCH_WORKERS, Prefetcher
+from utils import source_hash
+
+
+@st.cache_resource
+def get_prefetch_executor():
+    """One bounded worker pool per server process, shared by every session"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def get_prefetcher():
+    """Per-session map-stage bookkeeping on top of the shared pool"""
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(get_prefetch_executor())
+    return st.session_state.prefetcher
+
+
+def prefetch_enabled():
+    """Prefetch is on and an API key is configured"""
+    api_key = st.session_state.get("prefetch_model", ("", "", ""))[0]
+    return st.session_state.get("prefetch_enabled", False) and bool(api_key)
+
+
+def render_prefetch_controls(api_key, base_url, model_id):
+    """Sidebar toggle for speculative per-source analysis"""
+    st.session_state.prefetch_model = (api_key, base_url, model_id)
+    with st.sidebar:
+        st.toggle(
+            "⚡ Prefetch while adding sources",
+            key="prefetch_enabled",
+            help="Start per-source work for the selected Summary / Key Points lenses as soon as "
+                 "each source is added. Analyze then only has to combine the prepared notes."
+        )
+
+
+def prefetch_source(source):
+    """Kick off map-stage work for a newly added source"""
+    if not prefetch_enabled():
+        return
+    from ui.analysis import selected_lenses
+    lenses = [t for t in selected_lenses() if t in MAP_INSTRUCTIONS]
+    get_prefetcher().schedule(source, lenses, *st.session_state.prefetch_model)
+
+
+def cancel_prefetch(source=None):
+    """
+    Cancel work for a removed source, or for every source when none is given.
+    Call after the source has left st.session_state.sources: work shared with
+    an identical source that is still present is kept.
+    """
+    if "prefetcher" not in st.session_state:
+        return
+    if source is None:
+        st.session_state.prefetcher.cancel_all()
+    elif not any(source_hash(s) == source_hash(source) for s in st.session_state.sources):
+        st.session_state.prefetcher.cancel(source)
@@ -0,0 +1,71 @@
+import io
+import streamlit as st
+from snapshot import SNAPSHOT_EXTENSION, write_snapshot, read_snapshot
+from ui.sources import MAX_SOURCES
+from ui.prefetch import cancel_prefetch
+
+
+def render_session_controls():
+    """Sidebar section to export / restore a whole analysis session"""
+    if "snapshot_uploader_key" not in st.session_state:
+        st.session_state.snapshot_uploader_key = 0
+
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("💼 Session Snapshot", expanded=False):
+            st.caption("Save sources and results to a single compressed file, "
+                       "then restore them later without re-extracting or re-analyzing.")
+
+            if st.button("📦 Prepare snapshot", use_container_width=True,
+                         disabled=not st.session_state.sources):
+                export_snapshot()
+
+            uploaded = st.file_uploader(
+                "♻️ Restore a snapshot:",
+                type=["gz"],
+                key=f"snapshot_uploader_{st.session_state.snapshot_uploader_key}"
+            )
+            if uploaded is not None:
+                import_snapshot(uploaded)
+
+
+def export_snapshot():
+    """Write the current session as a snapshot and offer it for download"""
+    try:
+        # st.download_button needs the whole payload in memory as bytes anyway
+        with io.BytesIO() as buffer:
+            write_snapshot(
+                buffer,
+                st.session_state.sources,
+                st.session_state.analysis_cache,
+                st.session_state.result_keys,
+            )
+            data = buffer.getvalue()
+        st.download_button(
+            label="📥 Download snapshot",
+            data=data,
+            file_name=f"knowledge_session.{SNAPSHOT_EXTENSION}",
+            mime="application/gzip",
+            key="download_session_snapshot",
+            use_container_width=True,
+            type="primary"
+        )
+    except Exception as e:
+        st.error(f"❌ Could not build snapshot: {str(e)}")
+
+
+def import_snapshot(uploaded_file):
+    """Replace the current session with the contents of a snapshot"""
+    try:
+        sources, analysis_cache, result_keys = read_snapshot(uploaded_file, MAX_SOURCES)
+    except Exception as e:
+        st.error(f"❌ {str(e)}")
+        return
+
+    cancel_prefetch()
+    st.session_state.sources = sources
+    st.session_state.analysis_cache.update(analysis_cache)
+    st.session_state.result_keys = result_keys
+    st.session_state.snapshot_uploader_key += 1
+    st.toast(f"Restored {len(sources)} sources and {len(analysis_cache)} cached analyses.")
+    st.rerun()
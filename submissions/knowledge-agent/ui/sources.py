@@ -1,5 +1,8 @@
 import streamlit as st
-from utils import process_pdf, format_source_title, count_tokens
+from utils import format_source_title, count_tokens
+from corpus import Corpus
+from ui.prefetch import prefetch_source, cancel_prefetch
+from ingest import FILE_TYPES, file_extension, ingest_file, build_source, read_pdf
 
 MAX_SOURCES = 20
 
@@ -15,19 +18,22 @@ def init_source_state():
 
 
 def render_source_input():
-    """Render PDF upload and text input section"""
+    """Render file upload and text input section"""
     st.markdown("## 1. Add Your Content Sources")
 
-    # PDF Uploader
+    # File Uploader
     uploaded_file = st.file_uploader(
-        "📄 Upload a PDF file:",
-        type=['pdf'],
+        "📄 Upload a file (PDF, TXT, Markdown, HTML, DOCX, EPUB or a ZIP of them):",
+        type=FILE_TYPES,
         key=f"pdf_uploader_{st.session_state.file_uploader_key}"
     )
 
-    # Process PDF automatically
+    # Process file automatically
     if uploaded_file is not None and len(st.session_state.sources) < MAX_SOURCES:
-        add_pdf_source(uploaded_file)
+        if file_extension(uploaded_file.name) == "pdf":
+            add_pdf_source(uploaded_file)
+        else:
+            add_file_sources(uploaded_file)
 
     # Text input
     current_textarea_key = f"new_source_input_{st.session_state.textarea_key_counter}"
@@ -50,13 +56,11 @@ def render_source_input():
 def add_pdf_source(uploaded_file):
     """Process and add PDF file as source"""
     try:
-        text_content = process_pdf(uploaded_file)
+        source = build_source(uploaded_file.name, "pdf", read_pdf(uploaded_file))
 
-        if text_content:
-            st.session_state.sources.append({
-                "title": format_source_title(uploaded_file.name, "📄"),
-                "content": text_content
-            })
+        if source:
+            st.session_state.sources.append(source)
+            prefetch_source(source)
 
             st.session_state.file_uploader_key += 1
             st.success(f"✅ PDF '{uploaded_file.name}' added successfully!")
@@ -66,6 +70,37 @@ def add_pdf_source(uploaded_file):
         st.error(f"❌ {str(e)}")
 
 
+def add_file_sources(uploaded_file):
+    """Stream a text-like file or archive into sources, respecting MAX_SOURCES"""
+    try:
+        remaining = MAX_SOURCES - len(st.session_state.sources)
+        stats = {}
+        # Collect first: a corrupt member must not leave earlier members half-added
+        new_sources = list(ingest_file(uploaded_file, uploaded_file.name, remaining, stats))
+        st.session_state.sources.extend(new_sources)
+        for source in new_sources:
+            prefetch_source(source)
+
+        if stats.get("skipped"):
+            st.warning(f"❗ Maximum of {MAX_SOURCES} sources reached: {stats['skipped']} more file(s) "
+                       f"in '{uploaded_file.name}' were left unread.", icon="⚠️")
+        if new_sources:
+            st.success(f"✅ '{uploaded_file.name}' added {len(new_sources)} source(s) successfully!")
+        else:
+            st.warning(f"❗ No readable text found in '{uploaded_file.name}'.", icon="⚠️")
+
+    except Exception as e:
+        st.error(f"❌ {str(e)}")
+        return
+
+    finally:
+        # Reset the uploader even on failure so the same file is not re-ingested on every rerun
+        st.session_state.file_uploader_key += 1
+
+    if new_sources and not stats.get("skipped"):
+        st.rerun()
+
+
 def add_text_source(textarea_key):
     """Add text from textarea as source"""
     text_to_add = st.session_state.get(textarea_key, "").strip()
@@ -73,8 +108,11 @@ def add_text_source(textarea_key):
     if text_to_add:
         st.session_state.sources.append({
             "title": format_source_title(text_to_add, "📝"),
-            "content": text_to_add
+            "content": text_to_add,
+            "tokens": count_tokens(text_to_add),
+            "meta": {"kind": "text"},
         })
+        prefetch_source(st.session_state.sources[-1])
         st.session_state.textarea_key_counter += 1
         st.rerun()
     else:
@@ -89,9 +127,8 @@ def render_sources_list():
 
     st.markdown("---")
 
-    # Token counter
-    combined_text = "\n\n".join([s['content'] for s in st.session_state.sources])
-    total_tokens = count_tokens(combined_text)
+    # Token counter (per-source counts are taken once, at ingestion time)
+    total_tokens = Corpus(st.session_state.sources).token_count()
 
     st.info(f"📊 **Total tokens: {total_tokens:,}**")
 
@@ -108,6 +145,8 @@ def render_sources_list():
     st.markdown("### My Content Sources")
     if st.button("🗑️ Clear All Sources", type="secondary", use_container_width=True):
         st.session_state.sources = []
+        st.session_state.result_keys = {}
+        cancel_prefetch()
         st.rerun()
 
     # Display sources in columns
@@ -142,5 +181,6 @@ def render_source_card(index, source):
                 use_container_width=True,
                 type="secondary"
         ):
-            st.session_state.sources.pop(index)
+            cancel_prefetch(st.session_state.sources.pop(index))
+            st.session_state.result_keys = {}
             st.rerun()
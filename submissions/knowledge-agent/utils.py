@@ -1,7 +1,6 @@
 import urllib.parse
+import hashlib
 import tiktoken
-import PyPDF2
-import io
 import streamlit as st
 import textwrap
 import re, json
@@ -18,21 +17,6 @@ def count_tokens(text):
         return len(text) // 4
 
 
-def process_pdf(uploaded_file):
-    """Extract text from PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-        text_parts = []
-        for page in pdf_reader.pages:
-            text = page.extract_text()
-            if text.strip():
-                text_parts.append(text)
-
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        raise Exception(f"Error reading PDF: {str(e)}")
-
-
 def format_source_title(content, prefix="📝", max_length=60):
     """Format source title with emoji prefix and length limit"""
     return f"{prefix} {content[:max_length]}..."
@@ -52,11 +36,27 @@ def create_download_button(label, data, file_name_prefix, key_suffix,
     )
 
 
-def combine_sources(sources):
-    """Combine all source contents with separators"""
-    return "\n\n--- Source Separator ---\n\n".join(
-        [f"Source {i + 1}:\n{s['content']}" for i, s in enumerate(sources)]
-    )
+def content_hash(text):
+    """Stable SHA-256 hex digest of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def source_hash(source):
+    """Content hash of a source, memoised on the source dict"""
+    if "hash" not in source:
+        source["hash"] = content_hash(source["content"])
+    return source["hash"]
+
+
+def analysis_cache_key(sources, analysis_type, output_length, model_id, base_url, options=None):
+    """Key identifying one lens run (model, endpoint and lens-specific options) over an ordered set of sources"""
+    digest = hashlib.sha256()
+    digest.update(f"{analysis_type}\x00{output_length}\x00{model_id}\x00{base_url}".encode("utf-8"))
+    if options:
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    for s in sources:
+        digest.update(b"\x00" + source_hash(s).encode("ascii"))
+    return digest.hexdigest()
 
 
 def strip_code_fences(text: str) -> str:
@@ -72,9 +72,9 @@ def strip_code_fences(text: str) -> str:
 
 
 
-def render_dot_quickchart(raw: str, width: int = 700):
+def dot_quickchart_url(raw: str) -> str:
     """
-    Show a DOT graph via QuickChart GraphViz PNG.
+    Build the QuickChart GraphViz PNG URL for a DOT graph.
     """
     # 1. Strip ``` fences or stray labels
     dot = re.sub(r"```[a-zA-Z0-9]*\s*\n(.+?)```", r'\1', raw, flags=re.DOTALL).strip()
@@ -87,9 +87,8 @@ def render_dot_quickchart(raw: str, width: int = 700):
 
     # 3. Build API URL
     encoded = urllib.parse.quote_plus(dot)
-    url = f"https://quickchart.io/graphviz?format=png&graph={encoded}"
+    return f"https://quickchart.io/graphviz?format=png&graph={encoded}"
 
-    st.image(url, width=width)
 
 
 # ------------------------------------------------------------------